@@ -0,0 +1,57 @@
+"""
+Import time benchmark.
+
+Run with asv (`asv run`), or directly with `python benchmarks/bench_import.py`.
+"""
+import subprocess
+import sys
+import time
+
+
+def timeraw_import_stream_benchmark():
+    """
+    Time `import stream_benchmark` in a fresh interpreter (asv timeraw benchmark).
+    """
+    return "import stream_benchmark"
+
+def timeraw_import_numpy():
+    """
+    Reference: time `import numpy`, the only required dependency.
+    """
+    return "import numpy"
+
+def measure_import(module, repeat=5):
+    """
+    Measure the best import time of a module, each import in a fresh interpreter.
+
+    Parameters:
+    - module (str): Name of the module to import
+    - repeat (int): Number of fresh interpreters to launch
+
+    Returns:
+    - best (float): Best import time in seconds
+    - heavy (list): Heavy optional modules ('datasets', 'pyarrow') loaded by the import
+    """
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - start)\n"
+        "print(','.join(m for m in ('datasets', 'pyarrow') if m in sys.modules))\n"
+    )
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout.split("\n")
+        times.append(float(output[0]))
+    heavy = [m for m in output[1].split(",") if m]
+    return min(times), heavy
+
+
+if __name__ == "__main__":
+    numpy_time, _ = measure_import("numpy")
+    package_time, heavy = measure_import("stream_benchmark")
+    print(f"import numpy:            {numpy_time * 1000:.1f} ms")
+    print(f"import stream_benchmark: {package_time * 1000:.1f} ms (numpy included)")
+    if heavy:
+        print(f"WARNING: heavy optional modules imported at startup: {', '.join(heavy)}")
+        sys.exit(1)
@@ -0,0 +1,100 @@
+"""
+Generation and scoring benchmarks for every task of stream_small and stream_medium.
+
+Run with asv (`asv run`, `asv continuous main HEAD`), or without asv with `python -m benchmarks.run`.
+"""
+import importlib.util
+import os
+
+import numpy as np
+
+import stream_benchmark as sb
+from stream_benchmark import evals
+
+
+DIFFICULTIES = ['small', 'medium']
+TASK_NAMES = list(evals.stream_small.keys())
+
+
+def is_available(task_name, difficulty):
+    """
+    Check whether a task can be built offline: sequential_mnist needs datasets and a local copy of MNIST.
+
+    Parameters:
+    - task_name (str): Name of the task
+    - difficulty (str): Difficulty level of the task ('small' or 'medium')
+
+    Returns:
+    - available (bool): Whether the task can be built offline
+    """
+    if task_name != 'sequential_mnist':
+        return True
+    path = {'small': evals.stream_small, 'medium': evals.stream_medium}[difficulty][task_name]['params']['path']
+    return importlib.util.find_spec('datasets') is not None and path is not None and os.path.isdir(path)
+
+def output_bytes(data):
+    """
+    Total size in bytes of the arrays of a task, memory shared between splits counted once.
+    """
+    bases = {}
+    for value in data.values():
+        if isinstance(value, np.ndarray):
+            while isinstance(value.base, np.ndarray):
+                value = value.base
+            bases[id(value)] = value.nbytes
+    return sum(bases.values())
+
+def noisy_predictions(data, seed=0):
+    """
+    Build deterministic predictions for the test split: the targets plus gaussian noise.
+    """
+    rng = np.random.default_rng(seed)
+    return data['Y_test'] + rng.normal(0, 0.5, size=data['Y_test'].shape)
+
+
+class BuildTask:
+    """
+    Time, peak memory and output size of build_task.
+    """
+    params = (DIFFICULTIES, TASK_NAMES)
+    param_names = ['difficulty', 'task_name']
+    timeout = 600
+
+    def setup(self, difficulty, task_name):
+        if not is_available(task_name, difficulty):
+            raise NotImplementedError # asv skips the benchmark
+
+    def time_build_task(self, difficulty, task_name):
+        np.random.seed(0)
+        sb.build_task(task_name, difficulty)
+
+    def peakmem_build_task(self, difficulty, task_name):
+        np.random.seed(0)
+        sb.build_task(task_name, difficulty)
+
+    def track_output_bytes(self, difficulty, task_name):
+        np.random.seed(0)
+        return output_bytes(sb.build_task(task_name, difficulty))
+    track_output_bytes.unit = 'bytes'
+
+
+class ComputeScore:
+    """
+    Time and peak memory of compute_score on the test split.
+    """
+    params = (DIFFICULTIES, TASK_NAMES)
+    param_names = ['difficulty', 'task_name']
+    timeout = 600
+
+    def setup(self, difficulty, task_name):
+        if not is_available(task_name, difficulty):
+            raise NotImplementedError # asv skips the benchmark
+        np.random.seed(0)
+        self.data = sb.build_task(task_name, difficulty)
+        self.Y_hat = noisy_predictions(self.data)
+
+    def time_compute_score(self, difficulty, task_name):
+        sb.compute_score(self.data['Y_test'], self.Y_hat, self.data['T_test'], self.data['classification'])
+
+    def peakmem_compute_score(self, difficulty, task_name):
+        sb.compute_score(self.data['Y_test'], self.Y_hat, self.data['T_test'], self.data['classification'])
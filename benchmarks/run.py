@@ -0,0 +1,224 @@
+"""
+Offline benchmark runner, no asv required.
+
+Times build_task and compute_score for every task, records their peak memory (tracemalloc) and the output size,
+stores the results per commit and flags regressions against a saved baseline.
+
+Memory metrics are deterministic and gated by a relative threshold. Time metrics are noisy: they are only flagged
+if they exceed both a relative threshold and an absolute delta, and still do when the benchmark is measured again.
+
+Usage:
+    python -m benchmarks.run                          # run, save .benchmarks/<commit>.json
+    python -m benchmarks.run --save-baseline          # also save the results as .benchmarks/baseline.json
+    python -m benchmarks.run --baseline FILE          # compare against FILE (default .benchmarks/baseline.json)
+    python -m benchmarks.run --difficulty medium --tasks simple_copy sorting_problem
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import timeit
+import tracemalloc
+
+import numpy as np
+
+import stream_benchmark as sb
+from benchmarks.bench_import import measure_import
+from benchmarks.bench_tasks import DIFFICULTIES, TASK_NAMES, is_available, noisy_predictions, output_bytes
+
+
+def measure(fct, repeat):
+    """
+    Measure the best run time and the peak traced memory of a function.
+    Each timed run calls the function enough times to last at least 0.2 s (timeit autorange).
+
+    Parameters:
+    - fct (function): Function to measure, called without arguments
+    - repeat (int): Number of timed runs
+
+    Returns:
+    - result: Result of one call
+    - seconds (float): Best time of one call, in seconds
+    - peak_bytes (int): Peak memory allocated during one call, in bytes
+    """
+    timer = timeit.Timer(fct)
+    number, _ = timer.autorange()
+    seconds = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    # Peak memory in a separate run, tracemalloc slows the code down
+    tracemalloc.start()
+    result = fct()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return result, seconds, peak_bytes
+
+def run_benchmark(key, repeat):
+    """
+    Run one benchmark.
+
+    Parameters:
+    - key (str): 'import', or '<difficulty>/<task_name>' for the generation and scoring of a task
+    - repeat (int): Number of timed runs
+
+    Returns:
+    - metrics (dict): Metrics of the benchmark
+    """
+    if key == 'import':
+        return {'import_seconds': measure_import('stream_benchmark', 4 * repeat)[0]}
+
+    difficulty, task_name = key.split('/')
+
+    def build():
+        np.random.seed(0)
+        return sb.build_task(task_name, difficulty)
+    data, build_seconds, build_peak = measure(build, repeat)
+
+    Y_hat = noisy_predictions(data)
+    score = lambda: sb.compute_score(data['Y_test'], Y_hat, data['T_test'], data['classification'])
+    _, score_seconds, score_peak = measure(score, repeat)
+
+    return {
+        'build_seconds': build_seconds,
+        'build_peak_bytes': build_peak,
+        'output_bytes': output_bytes(data),
+        'score_seconds': score_seconds,
+        'score_peak_bytes': score_peak,
+    }
+
+def run_benchmarks(difficulties, task_names, repeat):
+    """
+    Run the import, generation and scoring benchmarks.
+
+    Parameters:
+    - difficulties (list): Difficulty levels to benchmark
+    - task_names (list): Tasks to benchmark
+    - repeat (int): Number of timed runs of each benchmark
+
+    Returns:
+    - results (dict): Metrics of each benchmark, keyed by 'import' or '<difficulty>/<task_name>'
+    """
+    results = {'import': run_benchmark('import', repeat)}
+    print(f"{'import':45s} {results['import']['import_seconds'] * 1000:8.1f}ms")
+    for difficulty in difficulties:
+        for task_name in task_names:
+            key = f'{difficulty}/{task_name}'
+            if not is_available(task_name, difficulty):
+                print(f'{key:45s} skipped (not available offline)')
+                continue
+
+            metrics = results[key] = run_benchmark(key, repeat)
+            print(f"{key:45s} build {metrics['build_seconds']:8.4f}s {metrics['build_peak_bytes'] / 2**20:9.1f}MiB | "
+                  f"score {metrics['score_seconds']:8.5f}s {metrics['score_peak_bytes'] / 2**20:9.1f}MiB | "
+                  f"output {metrics['output_bytes'] / 2**20:9.1f}MiB")
+    return results
+
+def is_regression(metric, reference, value, threshold, time_threshold, min_delta):
+    """
+    Whether a metric regressed compared to its baseline value.
+
+    Parameters:
+    - metric (str): Name of the metric, time metrics end with '_seconds'
+    - reference (float): Baseline value
+    - value (float): New value
+    - threshold (float): Relative increase above which a memory metric is a regression
+    - time_threshold (float): Relative increase above which a time metric may be a regression
+    - min_delta (float): Absolute increase in seconds below which a time metric is never a regression
+
+    Returns:
+    - regression (bool): Whether the metric regressed
+    """
+    if metric.endswith('_seconds'):
+        return value > reference * (1 + time_threshold) and value - reference > min_delta
+    return value > reference * (1 + threshold)
+
+def compare(results, baseline, threshold, time_threshold, min_delta):
+    """
+    Find the metrics that regressed compared to a baseline.
+
+    Parameters:
+    - results (dict): Metrics of each benchmark
+    - baseline (dict): Metrics of each benchmark in the baseline
+    - threshold (float): Relative increase above which a memory metric is a regression
+    - time_threshold (float): Relative increase above which a time metric may be a regression
+    - min_delta (float): Absolute increase in seconds below which a time metric is never a regression
+
+    Returns:
+    - regressions (list): (benchmark, metric, baseline value, new value) of each regression
+    """
+    regressions = []
+    for key, metrics in results.items():
+        for metric, value in metrics.items():
+            reference = baseline.get(key, {}).get(metric)
+            if reference is not None and is_regression(metric, reference, value, threshold, time_threshold, min_delta):
+                regressions.append((key, metric, reference, value))
+    return regressions
+
+def confirm(results, regressions, repeat):
+    """
+    Measure again the benchmarks with a time regression, and keep their best times.
+    A time regression caused by noise does not survive a second measurement.
+
+    Parameters:
+    - results (dict): Metrics of each benchmark, updated in place
+    - regressions (list): Regressions found by compare
+    - repeat (int): Number of timed runs of each benchmark
+    """
+    for key in {key for key, metric, _, _ in regressions if metric.endswith('_seconds')}:
+        metrics = run_benchmark(key, repeat)
+        for metric, value in metrics.items():
+            if metric.endswith('_seconds'):
+                results[key][metric] = min(results[key][metric], value)
+
+def current_commit():
+    """
+    Hash of the current git commit, 'unknown' outside of a git repository.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--difficulty', nargs='+', default=DIFFICULTIES, choices=DIFFICULTIES)
+    parser.add_argument('--tasks', nargs='+', default=TASK_NAMES, choices=TASK_NAMES)
+    parser.add_argument('--repeat', type=int, default=5, help='number of timed runs of each benchmark')
+    parser.add_argument('--output-dir', default='.benchmarks', help='directory of the results')
+    parser.add_argument('--baseline', default=None, help='results to compare against (default <output-dir>/baseline.json)')
+    parser.add_argument('--save-baseline', action='store_true', help='save the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative increase of a memory metric flagged as a regression')
+    parser.add_argument('--time-threshold', type=float, default=0.2, help='relative increase of a time metric flagged as a regression')
+    parser.add_argument('--min-delta', type=float, default=0.01, help='absolute increase in seconds below which a time metric is never flagged')
+    args = parser.parse_args()
+
+    commit = current_commit()
+    results = run_benchmarks(args.difficulty, args.tasks, args.repeat)
+
+    # Compare against the baseline, time regressions are confirmed by a second measurement
+    baseline_path = args.baseline or os.path.join(args.output_dir, 'baseline.json')
+    regressions = []
+    if os.path.isfile(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        gate = (args.threshold, args.time_threshold, args.min_delta)
+        regressions = compare(results, baseline['results'], *gate)
+        if any(metric.endswith('_seconds') for _, metric, _, _ in regressions):
+            confirm(results, regressions, args.repeat)
+            regressions = compare(results, baseline['results'], *gate)
+        print(f'\nCompared against {baseline_path} (commit {baseline["commit"]}): {len(regressions)} regression(s)')
+        for key, metric, reference, value in regressions:
+            print(f'  REGRESSION {key} {metric}: {reference:.4g} -> {value:.4g} ({value / reference - 1:+.0%})')
+
+    # Store the results of this commit
+    os.makedirs(args.output_dir, exist_ok=True)
+    record = {'commit': commit, 'numpy': np.__version__, 'python': sys.version.split()[0], 'results': results}
+    with open(os.path.join(args.output_dir, f'{commit}.json'), 'w') as f:
+        json.dump(record, f, indent=2)
+    if args.save_baseline:
+        with open(os.path.join(args.output_dir, 'baseline.json'), 'w') as f:
+            json.dump(record, f, indent=2)
+
+    sys.exit(1 if regressions else 0)
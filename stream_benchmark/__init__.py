@@ -1,58 +1,225 @@
 import stream_benchmark.evals as evals
+import stream_benchmark.tasks as tasks
+from stream_benchmark.baselines import ReservoirBaseline, evaluate_baseline
+from stream_benchmark.tasks import densify_targets
 import numpy as np
+from statistics import NormalDist
 
-def compute_score(Y, Y_hat, prediction_timesteps, classification):
+def _to_numpy(array, dtype=np.float32):
     """
-    Compute the accuracy of the model.
+    Convert an array to a numpy array, without copy when possible.
+    Raise a TypeError for arrays that cannot be exported through DLPack (e.g. device arrays or tensors requiring grad).
 
     Parameters:
-    - Y (np.ndarray): Target array [B, T, O]
+    - array (array-like): numpy array, DLPack-compatible array (torch, jax, cupy...) or nested lists
+    - dtype (np.dtype): Type of the array when it has to be copied, inferred if None
+
+    Returns:
+    - array (np.ndarray): numpy array, sharing memory with the input when exchanged through DLPack
+    """
+    if isinstance(array, np.ndarray):
+        return array
+    if hasattr(array, '__dlpack__'):
+        try:
+            return np.from_dlpack(array)
+        except (BufferError, RuntimeError, TypeError) as e:
+            raise TypeError(f"Cannot read the {type(array).__name__} as a numpy array through DLPack ({e}). "
+                            "Move it to the CPU first, e.g. with .detach().cpu() for torch tensors.") from e
+    return np.array(array, dtype=dtype)
+
+def _gather_predictions(Y, Y_hat, prediction_timesteps, sparse_targets=False):
+    """
+    Select the prediction timesteps of the targets and predictions.
+
+    Parameters:
+    - Y (np.ndarray): Target array [B, T, O], or [B, P, O] if sparse_targets
     - Y_hat (np.ndarray): Predicted array [B, T, O]
+    - prediction_timesteps (np.ndarray): Prediction timesteps [B, P]
+    - sparse_targets (bool): Whether Y only contains the targets at the prediction timesteps
+
+    Returns:
+    - preds (np.ndarray): Predictions at the prediction timesteps [B, P, O]
+    - truths (np.ndarray): Targets at the prediction timesteps [B, P, O]
+    """
+    batch = np.arange(Y.shape[0]).reshape(-1, 1)
+    timesteps = np.asarray(prediction_timesteps)
+    return Y_hat[batch, timesteps], Y if sparse_targets else Y[batch, timesteps]
+
+def compute_score(Y, Y_hat, prediction_timesteps, classification, sparse_targets=False):
+    """
+    Compute the accuracy of the model.
+
+    Parameters:
+    - Y (np.ndarray): Target array [B, T, O], numpy or any DLPack-compatible array (read without copy)
+    - Y_hat (np.ndarray): Predicted array [B, T, O], numpy or any DLPack-compatible array (read without copy)
     - prediction_timesteps (list): List of prediction timesteps
     - classification (bool): Whether the task is a classification task -> accuracy or MSE
+    - sparse_targets (bool): Whether Y only contains the targets at the prediction timesteps [B, P, O]
 
     Returns:
     - accuracy (float): Accuracy value
     """
     # Make sure Y_hat and Y are numpy arrays
-    if not isinstance(Y_hat, np.ndarray) or not isinstance(Y, np.ndarray):
-        Y = np.array(Y, dtype=np.float32)
-        Y_hat = np.array(Y_hat, dtype=np.float32)
+    Y = _to_numpy(Y)
+    Y_hat = _to_numpy(Y_hat)
 
     # Select only the prediction timesteps
-    preds = []
-    truths = []
-    for j in range(Y.shape[0]):
-        preds.append(Y_hat[j, prediction_timesteps[j], :])
-        truths.append(Y[j, prediction_timesteps[j], :])
+    preds, truths = _gather_predictions(Y, Y_hat, prediction_timesteps, sparse_targets)
 
     if classification:
         # Compute the accuracy
-        preds = np.argmax(np.stack(preds, axis=0), axis=-1)  # [B, prediction_timesteps] int: class
-        truths = np.argmax(np.stack(truths, axis=0), axis=-1)  # [B, prediction_timesteps] int: class
+        preds = np.argmax(preds, axis=-1)  # [B, prediction_timesteps] int: class
+        truths = np.argmax(truths, axis=-1)  # [B, prediction_timesteps] int: class
         score = np.sum(preds == truths) / (truths.shape[0] * len(prediction_timesteps[0]))
         score = 1 - score
 
     else:
         # Compute the MSE
-        preds = np.stack(preds, axis=0).reshape(-1, Y.shape[-1])  # [B * prediction_timesteps, O] float: logits
-        truths = np.stack(truths, axis=0).reshape(-1, Y.shape[-1])
+        preds = preds.reshape(-1, Y.shape[-1])  # [B * prediction_timesteps, O] float: logits
+        truths = truths.reshape(-1, Y.shape[-1])
         score = np.mean((preds - truths) ** 2)
 
     return score
 
-def build_task(task_name, difficulty='small'):
+def compute_scores(Y, Y_hats, prediction_timesteps, classification, sparse_targets=False):
     """
-    Build the task.
+    Compute the scores of several models on the same targets.
+    The targets are gathered (and their classes computed) only once for all the models.
 
     Parameters:
-    - task_name (str): Name of the task between 'sinus_forecasting', 'chaotic_forecasting', 'discrete_postcasting',
-        'continuous_postcasting', 'discrete_pattern_completion', 'continuous_pattern_completion', 'bracket_matching',
-        'simple_copy', 'selective_copy', 'adding_problem', 'sorting_problem', and 'sequential_mnist'
+    - Y (np.ndarray): Target array [B, T, O]
+    - Y_hats (np.ndarray or iterable): Stacked predicted arrays [M, B, T, O], or iterable of predicted arrays [B, T, O]
+    - prediction_timesteps (list): List of prediction timesteps
+    - classification (bool): Whether the task is a classification task -> error rate or MSE
+    - sparse_targets (bool): Whether Y only contains the targets at the prediction timesteps [B, P, O]
+
+    Returns:
+    - scores (np.ndarray): Score of each model [M]
+    """
+    # Make sure Y is a numpy array
+    Y = _to_numpy(Y)
+    if hasattr(Y_hats, '__dlpack__'):
+        Y_hats = _to_numpy(Y_hats)
+
+    # Select the prediction timesteps of the targets once
+    batch = np.arange(Y.shape[0]).reshape(-1, 1)
+    timesteps = np.asarray(prediction_timesteps)
+    truths = Y if sparse_targets else Y[batch, timesteps] # [B, P, O]
+    if classification:
+        truths = np.argmax(truths, axis=-1) # [B, P] int: class
+
+    def score(preds):
+        # Score a stack of predictions [m, B, P, O]
+        if classification:
+            return 1 - np.mean(np.argmax(preds, axis=-1) == truths, axis=(1, 2))
+        return np.mean((preds - truths) ** 2, axis=(1, 2, 3))
+
+    # Stacked predictions: a single vectorized pass
+    if isinstance(Y_hats, np.ndarray):
+        if Y_hats.ndim != 4:
+            raise ValueError(f"Stacked predictions must be [M, B, T, O], got {Y_hats.ndim} dimensions. Use compute_score for a single model, or Y_hats[np.newaxis].")
+        return score(Y_hats[:, batch, timesteps])
+
+    # Iterable of predictions: one pass per model, against the same targets
+    scores = []
+    for Y_hat in Y_hats:
+        Y_hat = _to_numpy(Y_hat)
+        scores.append(score(Y_hat[batch, timesteps][np.newaxis])[0])
+    return np.array(scores)
+
+def compute_score_early_stopping(predict, X, Y, prediction_timesteps, classification, tolerance=0.005, confidence=0.95, batch_size=32, growth_factor=2, sparse_targets=False):
+    """
+    Estimate the score on increasing batches of samples, and stop once it is known to the requested precision.
+
+    The samples are the statistical unit, since the errors within a sample are correlated. For classification
+    tasks, the confidence interval is a Wilson interval on the error rate, whose number of trials is the effective
+    sample size given the spread of the per-sample error rates: the number of samples if the errors are fully
+    correlated within a sample (or P == 1), up to the number of predictions if they are independent. For regression
+    tasks, it is a CLT interval on the per-sample MSE. At least two samples are required, the single-sequence tasks
+    ('sinus_forecasting' and 'chaotic_forecasting') are not supported: score them with compute_score.
+
+    Parameters:
+    - predict (function): Function returning the predictions [b, T, O] of a batch of inputs [b, T, I]
+    - X (np.ndarray): Input array [B, T, I]
+    - Y (np.ndarray): Target array [B, T, O], numpy or any DLPack-compatible array (read without copy)
+    - prediction_timesteps (np.ndarray): Prediction timesteps [B, P], numpy or any DLPack-compatible array
+    - classification (bool): Whether the task is a classification task -> error rate or MSE
+    - tolerance (float): Maximum half-width of the confidence interval
+    - confidence (float): Confidence level of the interval
+    - batch_size (int): Number of samples in the first batch
+    - growth_factor (float): Growth factor of the batch size between two batches
+    - sparse_targets (bool): Whether Y only contains the targets at the prediction timesteps [B, P, O]
+
+    Returns:
+    - result (dict): Dictionary containing the estimated score, the lower and upper bounds of the confidence
+    interval, the number of samples used and whether the tolerance was reached.
+    """
+    if not 0 < confidence < 1:
+        raise ValueError("The confidence level must be between 0 and 1.")
+    if batch_size < 1 or growth_factor < 1:
+        raise ValueError("The batch size must be positive and the growth factor at least 1.")
+
+    # Make sure Y and the prediction timesteps are numpy arrays
+    Y = _to_numpy(Y)
+    prediction_timesteps = _to_numpy(prediction_timesteps, dtype=None)
+    if Y.shape[0] < 2:
+        raise ValueError("At least two samples are required to estimate the spread of the score, use compute_score "
+                         "for single-sequence tasks such as 'sinus_forecasting' and 'chaotic_forecasting'.")
+
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    n_samples = 0
+    sample_scores = [] # error rate (classification) or MSE (regression) of each sample
+    score, lower, upper, half_width = np.nan, np.nan, np.nan, np.inf
+
+    while n_samples < Y.shape[0] and half_width > tolerance:
+        # Predict the next batch
+        batch = slice(n_samples, min(n_samples + batch_size, Y.shape[0]))
+        Y_batch, T_batch = Y[batch], prediction_timesteps[batch]
+        Y_hat_batch = predict(X[batch])
+        n_samples = batch.stop
+        batch_size = int(np.ceil(batch_size * growth_factor))
+
+        preds, truths = _gather_predictions(Y_batch, _to_numpy(Y_hat_batch), T_batch, sparse_targets)
+        if classification:
+            # Wilson interval on the error rate, with the effective sample size of correlated predictions
+            sample_scores.extend(np.mean(np.argmax(preds, axis=-1) != np.argmax(truths, axis=-1), axis=1))
+            n_predictions = preds.shape[1]
+            p = np.mean(sample_scores)
+            variance = np.var(sample_scores, ddof=1) if n_samples > 1 else 0
+            if 0 < p < 1 and variance > 0:
+                n = np.clip(n_samples * p * (1 - p) / variance, n_samples, n_samples * n_predictions)
+            else:
+                n = n_samples # no information on the correlation: assume the worst
+            center = (p + z ** 2 / (2 * n)) / (1 + z ** 2 / n)
+            half_width = z * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / (1 + z ** 2 / n)
+            score, lower, upper = p, max(center - half_width, 0), min(center + half_width, 1)
+
+        else:
+            # CLT interval on the mean of the per-sample MSE
+            sample_scores.extend(np.mean((preds - truths) ** 2, axis=(1, 2)))
+            score = np.mean(sample_scores)
+            half_width = z * np.std(sample_scores, ddof=1) / np.sqrt(n_samples) if n_samples > 1 else np.inf
+            lower, upper = score - half_width, score + half_width
+
+    return {
+        'score': score,
+        'lower': lower,
+        'upper': upper,
+        'n_samples': n_samples,
+        'converged': bool(half_width <= tolerance),
+    }
+
+def _get_task_config(task_name, difficulty):
+    """
+    Get the generator and parameters of a task.
+
+    Parameters:
+    - task_name (str): Name of the task
     - difficulty (str): Difficulty level of the task ('small' or 'medium')
 
     Returns:
-    - Task: Task object
+    - fct (function): Generator of the task
+    - params (dict): Parameters of the generator
     """
     # Check if the task name is valid 
     if task_name not in evals.stream_small:
@@ -69,8 +236,72 @@ def build_task(task_name, difficulty='small'):
     }[difficulty]
 
     # Get the function and parameters from the stream config
-    fct = stream[task_name]['fct']
-    params = stream[task_name]['params']
+    return stream[task_name]['fct'], stream[task_name]['params']
+
+def estimate_task(task_name, difficulty='small', sparse_targets=False, **overrides):
+    """
+    Estimate the memory needed to build a task, without generating anything.
+
+    Parameters:
+    - task_name (str): Name of the task (see build_task)
+    - difficulty (str): Difficulty level of the task ('small' or 'medium')
+    - sparse_targets (bool): Whether the targets are kept at the prediction timesteps only (see build_task)
+    - **overrides: Parameters of the task generator overriding those of the configuration (e.g. sequence_length)
+
+    Returns:
+    - estimate (dict): Dictionary containing the shape, dtype and size in bytes of each X_*, Y_*, T_* array ('arrays'),
+    the memory used by the task ('output_bytes', memory shared between splits counted once) and the estimated
+    peak memory during the generation ('peak_bytes'). For sequential_mnist, the memory used by the datasets
+    library itself is not included.
+    """
+    fct, params = _get_task_config(task_name, difficulty)
+    arrays, output_bytes, peak_bytes = tasks._estimate_arrays(fct, {**params, **overrides, 'sparse_targets': sparse_targets})
+    return {
+        'arrays': arrays,
+        'output_bytes': output_bytes,
+        'peak_bytes': peak_bytes,
+    }
+
+def build_task(task_name, difficulty='small', array_namespace=None, max_bytes=None, memmap_dir=None, sparse_targets=False, **overrides):
+    """
+    Build the task.
+
+    Parameters:
+    - task_name (str): Name of the task between 'sinus_forecasting', 'chaotic_forecasting', 'discrete_postcasting',
+        'continuous_postcasting', 'discrete_pattern_completion', 'continuous_pattern_completion', 'bracket_matching',
+        'simple_copy', 'selective_copy', 'adding_problem', 'sorting_problem', and 'sequential_mnist'
+    - difficulty (str): Difficulty level of the task ('small' or 'medium')
+    - array_namespace (module): Namespace with a from_dlpack function (e.g. torch, jax.numpy) in which to return
+        the arrays, exchanged without copy through DLPack. If None, numpy arrays are returned.
+    - max_bytes (int): Memory budget in bytes. If the estimated peak memory of the generation exceeds it, the arrays
+        are written in memory-mapped .npy files in memmap_dir instead of memory. If None, the arrays are always kept
+        in memory.
+    - memmap_dir (str): Directory of the memory-mapped files, required with max_bytes. The files are not removed
+        by stream_benchmark, the caller owns the directory.
+    - sparse_targets (bool): Whether to keep the targets at the prediction timesteps only: Y_* arrays are then
+        [B, P, O] and aligned with T_*. Use densify_targets to get a dense [B, T, O] view. The targets outside of
+        the prediction timesteps are dropped, which is lossy for 'sinus_forecasting', 'chaotic_forecasting',
+        'discrete_pattern_completion' and 'continuous_pattern_completion' (their dense targets are not zeros
+        there). The dense targets of 'sinus_forecasting' and 'chaotic_forecasting' are views of a single sequence
+        while their sparse targets are copies, so sparse targets use more memory for these two tasks.
+    - **overrides: Parameters of the task generator overriding those of the configuration (e.g. sequence_length)
+
+    Returns:
+    - Task: Task object
+    """
+    fct, params = _get_task_config(task_name, difficulty)
+    params = {**params, **overrides, 'sparse_targets': sparse_targets}
+    if max_bytes is not None and memmap_dir is None:
+        raise ValueError("A memmap_dir is required with max_bytes, to write the arrays that do not fit in the budget.")
+
+    # Generate the task, in memory-mapped files if it does not fit in the budget
+    if max_bytes is not None and tasks._estimate_arrays(fct, params)[2] > max_bytes:
+        params = {**params, 'out_dir': memmap_dir}
+    data = fct(**params)
+    data['sparse_targets'] = sparse_targets
+
+    # Hand the arrays over to the requested namespace, without copy
+    if array_namespace is not None:
+        data = {key: array_namespace.from_dlpack(value) if isinstance(value, np.ndarray) else value for key, value in data.items()}
 
-    # Generate the task
-    return fct(**params)
\ No newline at end of file
+    return data
\ No newline at end of file
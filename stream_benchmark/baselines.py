@@ -0,0 +1,138 @@
+import numpy as np
+
+
+# ------------ RESERVOIR BASELINE ------------ #
+
+class ReservoirBaseline:
+    """
+    Echo state network with a ridge regression readout, a cheap reference model for every task.
+
+    The readout is trained on the prediction timesteps only: the normal equations (S^T S, S^T Y) of the
+    reservoir states S are accumulated over mini-batches and timesteps, then solved once. The memory used
+    by the training is O(units^2 + batch_size * units), whatever the size of the dataset.
+
+    Parameters:
+    - units (int): Number of neurons of the reservoir
+    - spectral_radius (float): Spectral radius of the recurrent weights
+    - input_scaling (float): Scaling of the input weights
+    - leak_rate (float): Leak rate of the neurons, 1 for no leak
+    - ridge (float): Ridge regularization of the readout
+    - batch_size (int): Number of sequences processed together
+    - seed (int): Seed of the random weights
+    """
+    def __init__(self, units=200, spectral_radius=0.9, input_scaling=1.0, leak_rate=1.0, ridge=1e-6, batch_size=128, seed=None):
+        self.units = units
+        self.spectral_radius = spectral_radius
+        self.input_scaling = input_scaling
+        self.leak_rate = leak_rate
+        self.ridge = ridge
+        self.batch_size = batch_size
+        self.seed = seed
+        self.W_in = None
+        self.W_out = None
+
+    def _initialize(self, n_inputs):
+        """
+        Draw the input, recurrent and bias weights of the reservoir.
+        """
+        rng = np.random.default_rng(self.seed)
+        self.W_in = rng.uniform(-1, 1, size=(n_inputs, self.units)) * self.input_scaling
+        W = rng.normal(0, 1, size=(self.units, self.units))
+        self.W = W * self.spectral_radius / np.max(np.abs(np.linalg.eigvals(W)))
+        self.bias = rng.uniform(-1, 1, size=self.units) * self.input_scaling
+
+    def _run(self, X):
+        """
+        Run the reservoir over a batch of sequences, one timestep at a time.
+
+        Parameters:
+        - X (np.ndarray): Input array [b, T, I]
+
+        Yields:
+        - t (int): Timestep
+        - features (np.ndarray): Reservoir states and constant bias feature at timestep t [b, units + 1]
+        """
+        state = np.zeros((X.shape[0], self.units))
+        features = np.ones((X.shape[0], self.units + 1))
+        for t in range(X.shape[1]):
+            update = np.tanh(X[:, t, :] @ self.W_in + state @ self.W + self.bias)
+            state = (1 - self.leak_rate) * state + self.leak_rate * update
+            features[:, :-1] = state
+            yield t, features
+
+    def fit(self, X, Y, prediction_timesteps, sparse_targets=False):
+        """
+        Train the readout on the prediction timesteps.
+
+        Parameters:
+        - X (np.ndarray): Input array [B, T, I]
+        - Y (np.ndarray): Target array [B, T, O], or [B, P, O] if sparse_targets
+        - prediction_timesteps (np.ndarray): Prediction timesteps [B, P]
+        - sparse_targets (bool): Whether Y only contains the targets at the prediction timesteps
+
+        Returns:
+        - self (ReservoirBaseline): Trained model
+        """
+        self._initialize(X.shape[-1])
+        StS = np.zeros((self.units + 1, self.units + 1))
+        StY = np.zeros((self.units + 1, Y.shape[-1]))
+
+        for start in range(0, X.shape[0], self.batch_size):
+            batch = slice(start, start + self.batch_size)
+            X_batch, Y_batch = np.asarray(X[batch]), np.asarray(Y[batch])
+
+            # Index of each prediction timestep of the batch in T_*, -1 elsewhere
+            T_batch = np.asarray(prediction_timesteps[batch])
+            position = np.full(X_batch.shape[:2], -1)
+            position[np.arange(X_batch.shape[0]).reshape(-1, 1), T_batch] = np.arange(T_batch.shape[1])
+
+            # Accumulate the normal equations on the selected states
+            for t, features in self._run(X_batch):
+                rows = position[:, t] >= 0
+                if rows.any():
+                    S = features[rows]
+                    StS += S.T @ S
+                    StY += S.T @ (Y_batch[rows, position[rows, t], :] if sparse_targets else Y_batch[rows, t, :])
+
+        # Solve the regularized normal equations once
+        self.W_out = np.linalg.solve(StS + self.ridge * np.eye(self.units + 1), StY)
+        return self
+
+    def predict(self, X):
+        """
+        Predict the outputs at every timestep, ready for compute_score.
+
+        Parameters:
+        - X (np.ndarray): Input array [B, T, I]
+
+        Returns:
+        - Y_hat (np.ndarray): Predicted array [B, T, O]
+        """
+        if self.W_out is None:
+            raise ValueError("The model must be fitted before predicting.")
+
+        Y_hat = np.zeros(X.shape[:2] + (self.W_out.shape[1],))
+        for start in range(0, X.shape[0], self.batch_size):
+            batch = slice(start, start + self.batch_size)
+            for t, features in self._run(np.asarray(X[batch])):
+                Y_hat[batch, t, :] = features @ self.W_out
+        return Y_hat
+
+def evaluate_baseline(data, split='test', **kwargs):
+    """
+    Train a reservoir baseline on the training set of a task and score it.
+
+    Parameters:
+    - data (dict): Task data, as returned by build_task
+    - split (str): Split on which to score the baseline ('train', 'valid' or 'test')
+    - **kwargs: Parameters of the ReservoirBaseline
+
+    Returns:
+    - score (float): Error rate (classification) or MSE (regression) of the baseline
+    """
+    from stream_benchmark import compute_score
+
+    sparse_targets = data.get('sparse_targets', False)
+    model = ReservoirBaseline(**kwargs).fit(data['X_train'], data['Y_train'], data['T_train'], sparse_targets)
+    Y_hat = model.predict(data[f'X_{split}'])
+    return compute_score(data[f'Y_{split}'], Y_hat, data[f'T_{split}'], data['classification'], sparse_targets)
@@ -55,7 +55,7 @@ stream_small = {
     'sorting_problem': {
         'fct': generate_sorting_problem,
         'classification': True,
-        'params': {"n_train": 100, "n_valid": 20, "n_test": 100, "sequence_length": 10, "n_symbols": 3}, 
+        'params': {"n_train": 100, "n_valid": 20, "n_test": 100, "sequence_length": 10, "n_symbols": 3, "position_encoding": "onehot"}, 
     },
     'sequential_mnist': {
         'fct': generate_sequential_mnist,
@@ -118,7 +118,7 @@ stream_medium = {
     'sorting_problem': {
         'fct': generate_sorting_problem,
         'classification': True,
-        'params': {"n_train": 10000, "n_valid": 200, "n_test": 1000, "sequence_length": 10, "n_symbols": 3}, 
+        'params': {"n_train": 10000, "n_valid": 200, "n_test": 1000, "sequence_length": 10, "n_symbols": 3, "position_encoding": "onehot"}, 
     },
     'sequential_mnist': {
         'fct': generate_sequential_mnist,
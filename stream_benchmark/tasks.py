@@ -1,10 +1,55 @@
+import os
+import tempfile
+from inspect import signature
+
 import numpy as np
-from datasets import load_dataset
 
 
 # ------------ USEFUL FUNCTIONS ------------ #
 
-def _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification):
+def _allocate(shape, dtype=float, out_dir=None):
+    """
+    Allocate an output array of a generator, filled with zeros.
+
+    Parameters:
+    - shape (tuple): Shape of the array
+    - dtype (np.dtype): Type of the array
+    - out_dir (str): Directory in which to write the array as a memory-mapped .npy file (created if needed),
+        if None the array is kept in memory
+
+    Returns:
+    - array (np.ndarray): Allocated array, a np.memmap if out_dir is given
+    """
+    if out_dir is None:
+        return np.zeros(shape, dtype=dtype)
+
+    os.makedirs(out_dir, exist_ok=True)
+    fd, filename = tempfile.mkstemp(suffix='.npy', dir=out_dir)
+    os.close(fd)
+    return np.lib.format.open_memmap(filename, mode='w+', dtype=dtype, shape=shape)
+
+def densify_targets(Y, prediction_timesteps, sequence_length):
+    """
+    Dense view of sparse targets, for models trained on full sequences.
+    Only the prediction timesteps are filled, the other timesteps are zeros.
+
+    This gives back the dense targets for the tasks whose targets are zeros outside of the prediction timesteps.
+    It does not for 'sinus_forecasting', 'chaotic_forecasting', 'discrete_pattern_completion' and
+    'continuous_pattern_completion', whose dense targets also hold values outside of the prediction timesteps.
+
+    Parameters:
+    - Y (np.ndarray): Sparse target array [B, P, O]
+    - prediction_timesteps (np.ndarray): Prediction timesteps [B, P]
+    - sequence_length (int): Number of timesteps T of the inputs
+
+    Returns:
+    - Y_dense (np.ndarray): Dense target array [B, T, O]
+    """
+    Y_dense = np.zeros((Y.shape[0], sequence_length, Y.shape[-1]), dtype=Y.dtype)
+    Y_dense[np.arange(Y.shape[0]).reshape(-1, 1), np.asarray(prediction_timesteps)] = Y
+    return Y_dense
+
+def _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification, sparse_targets=False, out_dir=None):
     """
     Generate the samples and split them into training, validation and testing sets.
     
@@ -13,15 +58,26 @@ def _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample,
     - n_valid (int): Number of validation samples
     - n_test (int): Number of testing samples
     - generate_one_sample (function): Function to generate one sample
+    - classification (bool): Whether the task is a classification task
+    - sparse_targets (bool): Whether to keep the targets at the prediction timesteps only [B, P, O]
+    - out_dir (str): Directory in which to write the arrays as memory-mapped .npy files, if None they are kept in memory
     
     Returns:
     - data (dict): Dictionary containing the training, testing and validation sets and their respective prediction timesteps.
     It also contains the classification flag.
     """
-    # Generate the samples
+    def generate_one_output():
+        # Keep only the targets at the prediction timesteps if requested
+        input, target, timesteps = generate_one_sample()
+        return input, target[timesteps] if sparse_targets else target, timesteps
+
+    # Generate the samples, directly into the preallocated output arrays
     n_samples = n_train + n_test + n_valid
-    input, target, timesteps = zip(*[generate_one_sample() for _ in range(n_samples)])
-    input, target, timesteps = np.array(input), np.array(target), np.array(timesteps)
+    first_sample = generate_one_output()
+    input, target, timesteps = [_allocate((n_samples,) + array.shape, dtype=array.dtype, out_dir=out_dir) for array in first_sample]
+    input[0], target[0], timesteps[0] = first_sample
+    for i in range(1, n_samples):
+        input[i], target[i], timesteps[i] = generate_one_output()
     
     # Split the data into training and testing set
     X_train = input[:n_train, :, :]
@@ -54,7 +110,7 @@ def _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample,
 
 # ------------ SIMPLE MEMORY TEST ------------ #
 
-def generate_discrete_postcasting(n_train=1000, n_valid=200, n_test=200, sequence_length=1000, delay=10, n_symbols=8):
+def generate_discrete_postcasting(n_train=1000, n_valid=200, n_test=200, sequence_length=1000, delay=10, n_symbols=8, sparse_targets=False, out_dir=None):
     """
     [Multi sequence]
     Generates a copy task: the model must reproduce the input sequence 
@@ -67,6 +123,8 @@ def generate_discrete_postcasting(n_train=1000, n_valid=200, n_test=200, sequenc
     - sequence_length (int): sequence length
     - delay (int): delay before reproducing the sequence
     - n_symbols (int): number of possible symbols
+    - sparse_targets (bool): whether to keep the targets at the prediction timesteps only, Y_* are then [B, P, O] aligned with T_*
+    - out_dir (str): directory in which to write the arrays as memory-mapped .npy files, if None they are kept in memory
 
     Return:
     - data (dict): dictionary containing the training, validation and test sets as well as
@@ -81,12 +139,12 @@ def generate_discrete_postcasting(n_train=1000, n_valid=200, n_test=200, sequenc
 
         return input, target, timesteps
 
-    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=True)
+    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=True, sparse_targets=sparse_targets, out_dir=out_dir)
 
 
 
 
-def generate_continuous_postcasting(n_train=1000, n_valid=200, n_test=200, sequence_length=1000, delay=10):
+def generate_continuous_postcasting(n_train=1000, n_valid=200, n_test=200, sequence_length=1000, delay=10, sparse_targets=False, out_dir=None):
     """
     [Multi sequence]
     Generates a copy task: the model must reproduce the input sequence 
@@ -98,6 +156,8 @@ def generate_continuous_postcasting(n_train=1000, n_valid=200, n_test=200, seque
     - n_test (int): number of test samples
     - sequence_length (int): sequence length
     - delay (int): delay before reproducing the sequence
+    - sparse_targets (bool): whether to keep the targets at the prediction timesteps only, Y_* are then [B, P, O] aligned with T_*
+    - out_dir (str): directory in which to write the arrays as memory-mapped .npy files, if None they are kept in memory
 
     Return:
     - data (dict): dictionary containing the training, validation and test sets as well as
@@ -111,11 +171,11 @@ def generate_continuous_postcasting(n_train=1000, n_valid=200, n_test=200, seque
 
         return input, target, timesteps
 
-    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=False)
+    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=False, sparse_targets=sparse_targets, out_dir=out_dir)
 
 # ------------ SIGNAL PROCESSING TEST ------------ #
 
-def generate_sinus_forecasting(sequence_length=1000, forecast_length=1, training_ratio=0.8, validation_ratio=0.1, testing_ratio=0.1):
+def generate_sinus_forecasting(sequence_length=1000, forecast_length=1, training_ratio=0.8, validation_ratio=0.1, testing_ratio=0.1, sparse_targets=False, out_dir=None):
     """
     [Single sequence]
     Generates a frequency-modulated sinusoidal signal.
@@ -127,6 +187,8 @@ def generate_sinus_forecasting(sequence_length=1000, forecast_length=1, training
     - training_ratio (float): proportion of the sequence used for training
     - validation_ratio (float): proportion of the sequence used for validation
     - testing_ratio (float): proportion of the sequence used for testing
+    - sparse_targets (bool): whether to keep the targets at the prediction timesteps only, Y_* are then [B, P, O] aligned with T_*
+    - out_dir (str): directory in which to write the arrays as memory-mapped .npy files, if None they are kept in memory
 
     Return:
     - data (dict): dictionary containing the training, validation and test sets as well as
@@ -146,8 +208,10 @@ def generate_sinus_forecasting(sequence_length=1000, forecast_length=1, training
     carrier = np.sin(2 * np.pi * carrier_freq * t + modulator)
 
     # Create the input & target
-    input = carrier[:-forecast_length].reshape(1, -1, 1)
-    target = carrier[forecast_length:].reshape(1, -1, 1)
+    input = _allocate((1, sequence_length, 1), out_dir=out_dir)
+    target = _allocate((1, sequence_length, 1), out_dir=None if sparse_targets else out_dir) # temporary if sparse targets
+    input[0, :, 0] = carrier[:-forecast_length]
+    target[0, :, 0] = carrier[forecast_length:]
 
     # Split the data into training and testing set
     training_size = int(sequence_length * training_ratio)
@@ -164,6 +228,11 @@ def generate_sinus_forecasting(sequence_length=1000, forecast_length=1, training
     T_valid = np.arange(training_size, validation_size).reshape(1, -1)
     T_test = np.arange(validation_size, sequence_length).reshape(1, -1)
 
+    # Keep only the targets at the prediction timesteps if requested
+    if sparse_targets:
+        Y_train, Y_valid, Y_test = [_allocate((1, T.shape[1], target.shape[2]), out_dir=out_dir) for T in (T_train, T_valid, T_test)]
+        Y_train[:], Y_valid[:], Y_test[:] = target[:, T_train[0], :], target[:, T_valid[0], :], target[:, T_test[0], :]
+
     # Create the data dictionary
     data = {
         'X_train': X_train,
@@ -180,7 +249,7 @@ def generate_sinus_forecasting(sequence_length=1000, forecast_length=1, training
 
     return data
 
-def generate_chaotic_forecasting(sequence_length=1000, forecast_length=1, training_ratio=0.8, validation_ratio=0.1, testing_ratio=0.1):
+def generate_chaotic_forecasting(sequence_length=1000, forecast_length=1, training_ratio=0.8, validation_ratio=0.1, testing_ratio=0.1, sparse_targets=False, out_dir=None):
     """
     [Single sequence]
     Generates a chaotic time series (Lorenz system).
@@ -192,6 +261,8 @@ def generate_chaotic_forecasting(sequence_length=1000, forecast_length=1, traini
     - training_ratio (float): proportion of samples used for training
     - validation_ratio (float): proportion of samples used for validation
     - testing_ratio (float): proportion of samples used for testing
+    - sparse_targets (bool): whether to keep the targets at the prediction timesteps only, Y_* are then [B, P, O] aligned with T_*
+    - out_dir (str): directory in which to write the arrays as memory-mapped .npy files, if None they are kept in memory
 
     Return:
     - data (dict): dictionary containing the training, validation and test sets as well as
@@ -230,8 +301,10 @@ def generate_chaotic_forecasting(sequence_length=1000, forecast_length=1, traini
     zs = (zs - np.mean(zs)) / (3*np.std(zs))
 
     # Create the input & target
-    input = np.column_stack((xs[:-forecast_length], ys[:-forecast_length], zs[:-forecast_length])).reshape(1, -1, 3)
-    target = np.column_stack((xs[forecast_length:], ys[forecast_length:], zs[forecast_length:])).reshape(1, -1, 3)
+    input = _allocate((1, sequence_length, 3), out_dir=out_dir)
+    target = _allocate((1, sequence_length, 3), out_dir=None if sparse_targets else out_dir) # temporary if sparse targets
+    input[0] = np.column_stack((xs[:-forecast_length], ys[:-forecast_length], zs[:-forecast_length]))
+    target[0] = np.column_stack((xs[forecast_length:], ys[forecast_length:], zs[forecast_length:]))
 
     # Split the data into training and testing set
     training_size = int(sequence_length * training_ratio)
@@ -248,6 +321,11 @@ def generate_chaotic_forecasting(sequence_length=1000, forecast_length=1, traini
     T_valid = np.arange(training_size, validation_size).reshape(1, -1)
     T_test = np.arange(validation_size, sequence_length).reshape(1, -1)
 
+    # Keep only the targets at the prediction timesteps if requested
+    if sparse_targets:
+        Y_train, Y_valid, Y_test = [_allocate((1, T.shape[1], target.shape[2]), out_dir=out_dir) for T in (T_train, T_valid, T_test)]
+        Y_train[:], Y_valid[:], Y_test[:] = target[:, T_train[0], :], target[:, T_valid[0], :], target[:, T_test[0], :]
+
     # Create the data dictionary
     data = {
         'X_train': X_train,
@@ -266,7 +344,7 @@ def generate_chaotic_forecasting(sequence_length=1000, forecast_length=1, traini
 
 # ------------ LONG-TERM DEPENDENCY TEST ------------ #
 
-def generate_discrete_pattern_completion(n_train=1000, n_valid=200, n_test=200, sequence_length=1000, n_symbols=8, base_length=5, mask_ratio=0.2):
+def generate_discrete_pattern_completion(n_train=1000, n_valid=200, n_test=200, sequence_length=1000, n_symbols=8, base_length=5, mask_ratio=0.2, sparse_targets=False, out_dir=None):
     """
     [Multi sequence]
     The model must identify and complete repetitive patterns.
@@ -282,6 +360,8 @@ def generate_discrete_pattern_completion(n_train=1000, n_valid=200, n_test=200,
     - n_symbols (int): number of possible symbols
     - base_length (int): pattern length
     - mask_ratio (float): proportion of symbols to mask
+    - sparse_targets (bool): whether to keep the targets at the prediction timesteps only, Y_* are then [B, P, O] aligned with T_*
+    - out_dir (str): directory in which to write the arrays as memory-mapped .npy files, if None they are kept in memory
 
     Return:
     - data (dict): dictionary containing the training, validation and test sets as well as
@@ -306,9 +386,9 @@ def generate_discrete_pattern_completion(n_train=1000, n_valid=200, n_test=200,
         return input, target, timesteps
 
     # Generate the samples
-    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=True)
+    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=True, sparse_targets=sparse_targets, out_dir=out_dir)
 
-def generate_continuous_pattern_completion(n_train=1000, n_valid=200, n_test=200, sequence_length=100, base_length=5, mask_ratio=0.2):
+def generate_continuous_pattern_completion(n_train=1000, n_valid=200, n_test=200, sequence_length=100, base_length=5, mask_ratio=0.2, sparse_targets=False, out_dir=None):
     """
     [Multi sequence]
     The model must identify and complete repetitive patterns.
@@ -323,6 +403,8 @@ def generate_continuous_pattern_completion(n_train=1000, n_valid=200, n_test=200
     - base_length (int): pattern length
     - mask_ratio (float): proportion of masked symbols
     - training_ratio (float): proportion of samples used for training
+    - sparse_targets (bool): whether to keep the targets at the prediction timesteps only, Y_* are then [B, P, O] aligned with T_*
+    - out_dir (str): directory in which to write the arrays as memory-mapped .npy files, if None they are kept in memory
 
     Return:
     - data (dict): dictionary containing the training, validation and test sets as well as
@@ -347,9 +429,9 @@ def generate_continuous_pattern_completion(n_train=1000, n_valid=200, n_test=200
         return input, target, timesteps
 
     # Generate the samples
-    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=False)
+    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=False, sparse_targets=sparse_targets, out_dir=out_dir)
 
-def generate_simple_copy(n_train=1000, n_valid=200, n_test=200, sequence_length=100, delay=10, n_symbols=8):
+def generate_simple_copy(n_train=1000, n_valid=200, n_test=200, sequence_length=100, delay=10, n_symbols=8, sparse_targets=False, out_dir=None):
     """
     [Multi sequence]
     Generates a copy task: the model must read an entire sequence, 
@@ -362,6 +444,8 @@ def generate_simple_copy(n_train=1000, n_valid=200, n_test=200, sequence_length=
     - sequence_length (int): sequence length
     - delay (int): delay before reproducing the sequence
     - n_symbols (int): number of possible symbols
+    - sparse_targets (bool): whether to keep the targets at the prediction timesteps only, Y_* are then [B, P, O] aligned with T_*
+    - out_dir (str): directory in which to write the arrays as memory-mapped .npy files, if None they are kept in memory
 
     Return:
     - data (dict): dictionary containing the training, validation and test sets as well as
@@ -385,9 +469,9 @@ def generate_simple_copy(n_train=1000, n_valid=200, n_test=200, sequence_length=
         return input_sequence, target_sequence, timesteps
     
     # Generate the samples
-    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=True)
+    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=True, sparse_targets=sparse_targets, out_dir=out_dir)
 
-def generate_selective_copy(n_train=1000, n_valid=200, n_test=200, sequence_length=100, delay=2, n_markers=2, n_symbols=8):
+def generate_selective_copy(n_train=1000, n_valid=200, n_test=200, sequence_length=100, delay=2, n_markers=2, n_symbols=8, sparse_targets=False, out_dir=None):
     """
     [Multi sequence]
     The model must read an entire sequence, memorize the marked elements,
@@ -401,6 +485,8 @@ def generate_selective_copy(n_train=1000, n_valid=200, n_test=200, sequence_leng
     - delay (int): delay before reproducing the sequence
     - n_markers (int): number of elements to memorize < sequence_length
     - n_symbols (int): number of possible symbols
+    - sparse_targets (bool): whether to keep the targets at the prediction timesteps only, Y_* are then [B, P, O] aligned with T_*
+    - out_dir (str): directory in which to write the arrays as memory-mapped .npy files, if None they are kept in memory
 
     Return: 
     - data (dict): dictionary containing the training, validation and test sets as well as
@@ -429,11 +515,11 @@ def generate_selective_copy(n_train=1000, n_valid=200, n_test=200, sequence_leng
         return input, target, timesteps
 
     # Generate the samples
-    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=True)
+    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=True, sparse_targets=sparse_targets, out_dir=out_dir)
 
 # ------------ TEST FOR MANIPULATION OF RETAINED INFORMATION ------------ #
 
-def generate_adding_problem(n_train=1000, n_valid=200, n_test=200, sequence_length=100, max_number=9):
+def generate_adding_problem(n_train=1000, n_valid=200, n_test=200, sequence_length=100, max_number=9, sparse_targets=False, out_dir=None):
     """
     [Multi sequence]
     The model must read a sequence of random numbers, 
@@ -445,6 +531,8 @@ def generate_adding_problem(n_train=1000, n_valid=200, n_test=200, sequence_leng
     - n_test (int): number of test samples
     - sequence_length (int): sequence length
     - max_number (int): maximum possible number
+    - sparse_targets (bool): whether to keep the targets at the prediction timesteps only, Y_* are then [B, P, O] aligned with T_*
+    - out_dir (str): directory in which to write the arrays as memory-mapped .npy files, if None they are kept in memory
 
     Return:
     - data (dict): dictionary containing the training, validation and test sets as well as
@@ -472,42 +560,94 @@ def generate_adding_problem(n_train=1000, n_valid=200, n_test=200, sequence_leng
         return input, target, timesteps
     
     # Generate the samples
-    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=True)
+    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=True, sparse_targets=sparse_targets, out_dir=out_dir)
+
+def _encode_positions(order, sequence_length, position_encoding):
+    """
+    Encode the target position of each element of the sorting problem.
+
+    Parameters:
+    - order (np.ndarray): Target position of each element [sequence_length]
+    - sequence_length (int): Sequence length
+    - position_encoding (str): 'onehot', 'index', 'binary' or 'sinusoidal'
+
+    Returns:
+    - positions (np.ndarray): Encoded positions [sequence_length, position_dim]
+    """
+    if position_encoding == 'onehot':
+        # One column per position, the trigger uses the extra last column
+        return np.eye(sequence_length + 1)[order]
+
+    if position_encoding == 'index':
+        # Single channel, position scaled to [0, 1]
+        return (order / max(sequence_length - 1, 1)).reshape(-1, 1)
 
-def generate_sorting_problem(n_train=1000, n_valid=200, n_test=200, sequence_length=100, n_symbols=8):
+    n_bits = max(int(np.ceil(np.log2(sequence_length))), 1)
+    if position_encoding == 'binary':
+        # Binary code of the position, most significant bit first
+        return ((order.reshape(-1, 1) >> np.arange(n_bits - 1, -1, -1)) & 1).astype(float)
+
+    if position_encoding == 'sinusoidal':
+        # Sine and cosine features at geometrically spaced frequencies
+        frequencies = 1 / (2 * sequence_length) ** (np.arange(n_bits) / n_bits)
+        angles = order.reshape(-1, 1) * frequencies
+        return np.concatenate([np.sin(angles), np.cos(angles)], axis=1)
+
+    raise ValueError(f"Unknown position encoding {position_encoding}. Available encodings are: 'onehot', 'index', 'binary', 'sinusoidal'.")
+
+def _sorting_channels(sequence_length, n_symbols, position_encoding):
+    """
+    Number of input channels of the sorting problem: symbols, positions and trigger.
+    The 'onehot' encoding has an extra position column, used by the trigger.
+    """
+    n_bits = max(int(np.ceil(np.log2(sequence_length))), 1)
+    position_dims = {'onehot': sequence_length + 1, 'index': 1, 'binary': n_bits, 'sinusoidal': 2 * n_bits}
+    if position_encoding not in position_dims:
+        raise ValueError(f"Unknown position encoding {position_encoding}. Available encodings are: {', '.join(repr(e) for e in position_dims)}.")
+    position_dim = position_dims[position_encoding]
+    return position_dim, n_symbols + position_dim + (position_encoding != 'onehot')
+
+def generate_sorting_problem(n_train=1000, n_valid=200, n_test=200, sequence_length=100, n_symbols=8, position_encoding='onehot', sparse_targets=False, out_dir=None):
     """
     [Multi sequence]
-    Generates a sequence of symbols (one-hot) randomly, each associated with a position (one-hot). 
+    Generates a sequence of symbols (one-hot) randomly, each associated with a position. 
     The model must sort the sequence according to positions, once the trigger signal is received.
 
+    The 'onehot' position encoding uses sequence_length + 1 input channels, so memory grows
+    quadratically with sequence_length. The 'index' (1 channel), 'binary' (log2 channels) and
+    'sinusoidal' (2 * log2 channels) encodings keep it linear for long sequences.
+
     Args:
     - n_train (int): number of training samples
     - n_valid (int): number of validation samples
     - n_test (int): number of test samples
     - sequence_length (int): sequence length
     - n_symbols (int): number of possible symbols
+    - position_encoding (str): encoding of the positions, 'onehot', 'index', 'binary' or 'sinusoidal'
+    - sparse_targets (bool): whether to keep the targets at the prediction timesteps only, Y_* are then [B, P, O] aligned with T_*
+    - out_dir (str): directory in which to write the arrays as memory-mapped .npy files, if None they are kept in memory
 
     Return:
     - data (dict): dictionary containing the training, validation and test sets as well as
     their respective prediction timesteps. It also contains the classification flag.
     """
+    # Number of input channels: symbols, positions and trigger
+    position_dim, n_channels = _sorting_channels(sequence_length, n_symbols, position_encoding)
+
     def generate_one_sample():
         # Create a sequence of symbols & a random order
         sequence = np.random.randint(0, n_symbols, sequence_length)
         order = np.random.permutation(sequence_length)
 
-        # One-hot encode the sequence and order
+        # Encode the sequence and order
         sequence_onehot = np.eye(n_symbols)[sequence]
-        order_onehot = np.eye(sequence_length + 1)[order]
-        sequence_order = np.concatenate([sequence_onehot, order_onehot], axis=1)
-
-        # Create other input parts   
-        marker = np.zeros((1, n_symbols + sequence_length + 1))
-        marker[0, n_symbols+sequence_length] = 1
-        zero_input_pad = np.zeros((sequence_length, n_symbols + sequence_length + 1))
+        order_encoded = _encode_positions(order, sequence_length, position_encoding)
 
         # Create the input & target
-        input = np.concatenate([sequence_order, marker, zero_input_pad], axis=0)
+        input = np.zeros((sequence_length+1+sequence_length, n_channels))
+        input[:sequence_length, :n_symbols] = sequence_onehot
+        input[:sequence_length, n_symbols:n_symbols+position_dim] = order_encoded
+        input[sequence_length, -1] = 1 # marker
         target = np.zeros((sequence_length+1+sequence_length, n_symbols))
         target[sequence_length + 1 + order] = sequence_onehot
 
@@ -517,9 +657,9 @@ def generate_sorting_problem(n_train=1000, n_valid=200, n_test=200, sequence_len
         return input, target, timesteps
     
     # Generate the samples
-    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=True)
+    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=True, sparse_targets=sparse_targets, out_dir=out_dir)
 
-def generate_sequential_mnist(n_train=1000, n_valid=200, n_test=200, path=None, cache_dir=None):
+def generate_sequential_mnist(n_train=1000, n_valid=200, n_test=200, path=None, cache_dir=None, sparse_targets=False, out_dir=None):
     """
     [Multi sequence]
     Generates an MNIST image classification task: the model must read an image column by column,
@@ -531,11 +671,19 @@ def generate_sequential_mnist(n_train=1000, n_valid=200, n_test=200, path=None,
     - n_test (int): number of test samples
     - path (str): path to the MNIST dataset, if None, the dataset is downloaded
     - cache_dir (str): path to the huggingface cache folder, if None, the default cache is used
+    - sparse_targets (bool): whether to keep the targets at the prediction timesteps only, Y_* are then [B, P, O] aligned with T_*
+    - out_dir (str): directory in which to write the arrays as memory-mapped .npy files, if None they are kept in memory
 
     Return:
     - data (dict): dictionary containing the training, validation and test sets as well as
     their respective prediction timesteps. It also contains the classification flag.
     """
+    # Import datasets lazily, it is an optional dependency and slow to import
+    try:
+        from datasets import load_dataset
+    except ImportError as e:
+        raise ImportError("The 'datasets' package is required for sequential_mnist. Install it with `pip install stream-benchmark[mnist]`.") from e
+
     # Load MNIST data
     dataset = load_dataset(path, cache_dir=cache_dir) if path else load_dataset("mnist")
     X = np.concatenate([np.array(dataset['train']['image']), np.array(dataset['test']['image'])]).transpose(0, 2, 1) # so we can read it column by column
@@ -546,21 +694,21 @@ def generate_sequential_mnist(n_train=1000, n_valid=200, n_test=200, path=None,
     if n_samples > X.shape[0]:
         raise ValueError(f"Not enough samples in the dataset. {X.shape[0]} samples available, {n_samples} requested.")
     
-    # Normalize the data
-    X = X / 255
-
     # Shuffle and select the samples
     shuffle = np.random.permutation(X.shape[0])[:n_samples]
     X = X[shuffle]
     Y = Y[shuffle]
 
+    # Normalize the data, only the selected samples
+    X = X / 255
+
     # Create inputs
-    inputs = np.zeros((X.shape[0], X.shape[1]+2, X.shape[2]+1))
+    inputs = _allocate((X.shape[0], X.shape[1]+2, X.shape[2]+1), out_dir=out_dir)
     inputs[:, -2, -1] = 1 # trigger
     inputs[:, :-2, :-1] = X
 
-    # Create targets
-    targets = np.zeros((X.shape[0], X.shape[1]+2, 10))
+    # Create targets, only the prediction timestep if sparse targets are requested
+    targets = _allocate((X.shape[0], 1 if sparse_targets else X.shape[1]+2, 10), out_dir=out_dir)
     targets[:, -1, :] = np.eye(10)[Y]
 
     # Split the data into training and testing set
@@ -592,7 +740,7 @@ def generate_sequential_mnist(n_train=1000, n_valid=200, n_test=200, path=None,
 
     return data
 
-def generate_bracket_matching(n_train=1000, n_valid=200, n_test=200, sequence_length=100, max_depth=5):
+def generate_bracket_matching(n_train=1000, n_valid=200, n_test=200, sequence_length=100, max_depth=5, sparse_targets=False, out_dir=None):
     """
     [Multi sequence]
     Generates a sequence of parentheses that the model must validate.
@@ -604,6 +752,8 @@ def generate_bracket_matching(n_train=1000, n_valid=200, n_test=200, sequence_le
     - n_test (int): number of test samples
     - sequence_length (int): sequence length
     - max_depth (int): maximum depth of parentheses
+    - sparse_targets (bool): whether to keep the targets at the prediction timesteps only, Y_* are then [B, P, O] aligned with T_*
+    - out_dir (str): directory in which to write the arrays as memory-mapped .npy files, if None they are kept in memory
 
     Return:
     - data (dict): dictionary containing the training, validation and test sets as well as
@@ -667,4 +817,130 @@ def generate_bracket_matching(n_train=1000, n_valid=200, n_test=200, sequence_le
         return input, target, timesteps
     
     # Generate the samples
-    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=True)
\ No newline at end of file
+    return _generate_train_test_samples(n_train, n_valid, n_test, generate_one_sample, classification=True, sparse_targets=sparse_targets, out_dir=out_dir)
+
+# ------------ MEMORY ESTIMATION ------------ #
+
+# Margin added to the estimated peak memory, for the small temporaries of the generation
+_PEAK_MARGIN_BYTES = 64 * 1024
+
+def _sample_shapes(fct, p):
+    """
+    Shapes of one sample of a multi sequence generator.
+
+    Parameters:
+    - fct (function): Generator of the task
+    - p (dict): Parameters of the generator, defaults included
+
+    Returns:
+    - input_shape (tuple): Shape of the input of one sample
+    - target_shape (tuple): Shape of the target of one sample
+    - n_timesteps (int): Number of prediction timesteps of one sample
+    - transient_bytes (int): Extra memory used to generate one sample
+    """
+    L = p.get('sequence_length')
+    if fct is generate_discrete_postcasting:
+        return (L, p['n_symbols']), (L, p['n_symbols']), L - p['delay'], 0
+    if fct is generate_continuous_postcasting:
+        return (L, 1), (L, 1), L - p['delay'], 0
+    if fct is generate_discrete_pattern_completion:
+        return (L, p['n_symbols'] + 1), (L, p['n_symbols']), int(L * p['mask_ratio']), 0
+    if fct is generate_continuous_pattern_completion:
+        return (L, 1), (L, 1), int(L * p['mask_ratio']), 0
+    if fct is generate_simple_copy:
+        length = L + p['delay'] + 1 + L
+        return (length, p['n_symbols'] + 1), (length, p['n_symbols']), L, 8 * L * p['n_symbols']
+    if fct is generate_selective_copy:
+        length = L + p['delay'] + 1 + p['n_markers']
+        return (length, p['n_symbols'] + 2), (length, p['n_symbols']), p['n_markers'], 8 * L * p['n_symbols']
+    if fct is generate_adding_problem:
+        return (L + 2, p['max_number'] + 2), (L + 2, 2 * p['max_number'] - 1), 1, 0
+    if fct is generate_sorting_problem:
+        position_dim, n_channels = _sorting_channels(L, p['n_symbols'], p['position_encoding'])
+        # One-hot positions index an identity matrix [L+1, L+1]
+        eye_bytes = 8 * (L + 1) ** 2 if p['position_encoding'] == 'onehot' else 0
+        return (2 * L + 1, n_channels), (2 * L + 1, p['n_symbols']), L, eye_bytes + 8 * L * (p['n_symbols'] + position_dim)
+    if fct is generate_bracket_matching:
+        return (L + 2, 3), (L + 2, 2), 1, 0
+    raise ValueError(f"No memory estimation available for {fct.__name__}.")
+
+def _estimate_arrays(fct, params):
+    """
+    Estimate the arrays returned by a generator, without generating anything.
+
+    Parameters:
+    - fct (function): Generator of the task
+    - params (dict): Parameters of the generator
+
+    Returns:
+    - arrays (dict): Shape, dtype and size in bytes of each array X_*, Y_*, T_*
+    - output_bytes (int): Memory used by the returned arrays, memory shared between arrays counted once
+    - peak_bytes (int): Estimated peak memory during the generation, output included
+    """
+    bound = signature(fct).bind(**params)
+    bound.apply_defaults()
+    p = bound.arguments
+    sparse_targets = p['sparse_targets']
+    f8, i8 = np.dtype(np.float64), np.dtype(np.int64)
+
+    def nbytes(shape, dtype):
+        return int(np.prod(shape)) * dtype.itemsize
+
+    if fct in (generate_sinus_forecasting, generate_chaotic_forecasting):
+        # Single sequence: the splits are views of the same input & target
+        L, F = p['sequence_length'], p['forecast_length']
+        n_channels = 1 if fct is generate_sinus_forecasting else 3
+        training_size = int(L * p['training_ratio'])
+        validation_size = int(L * (p['training_ratio'] + p['validation_ratio']))
+        sizes = {'train': training_size, 'valid': validation_size, 'test': L}
+        n_timesteps = {'train': training_size - F, 'valid': validation_size - training_size, 'test': L - validation_size}
+        arrays = {}
+        for split in ['train', 'valid', 'test']:
+            n = max(n_timesteps[split], 0)
+            arrays[f'X_{split}'] = ((1, sizes[split], n_channels), f8)
+            arrays[f'Y_{split}'] = ((1, n if sparse_targets else sizes[split], n_channels), f8)
+            arrays[f'T_{split}'] = ((1, n), i8)
+        timesteps_bytes = sum(nbytes(*arrays[f'T_{split}']) for split in sizes)
+        # Sparse targets are gathered copies, the dense target is then a temporary
+        sparse_bytes = sum(nbytes(*arrays[f'Y_{split}']) for split in sizes) if sparse_targets else 0
+        # Input & target are copied in the output arrays, the splits are views of them
+        output_bytes = 8 * L * n_channels * (1 if sparse_targets else 2) + timesteps_bytes + sparse_bytes
+        # With sparse targets, the dense target and the gathered targets (before their copy) are temporaries
+        sparse_transient_bytes = 8 * L * n_channels + sparse_bytes if sparse_targets else 0
+        if fct is generate_sinus_forecasting:
+            # t, the modulator and the carrier are temporaries
+            peak_bytes = output_bytes + 3 * 8 * (L + F) + sparse_transient_bytes
+        else:
+            # xs, ys, zs and their normalized copies are temporaries, as well as the stacked columns
+            peak_bytes = output_bytes + 2 * 8 * (L + F) * 3 + 8 * L * 3 + sparse_transient_bytes
+
+    elif fct is generate_sequential_mnist:
+        # 70,000 images [28, 28] are loaded as uint8, the selected ones normalized as float64
+        n_images, n_samples = 70000, p['n_train'] + p['n_valid'] + p['n_test']
+        counts = {'train': p['n_train'], 'valid': p['n_valid'], 'test': p['n_test']}
+        arrays = {}
+        for split, n in counts.items():
+            arrays[f'X_{split}'] = ((n, 30, 29), f8)
+            arrays[f'Y_{split}'] = ((n, 1 if sparse_targets else 30, 10), f8)
+            arrays[f'T_{split}'] = ((n, 1), i8)
+        output_bytes = sum(nbytes(*array) for array in arrays.values())
+        peak_bytes = output_bytes + 2 * n_images * 28 * 28 + n_samples * 28 * 28 * (1 + 8)
+
+    else:
+        # Multi sequence: samples are written in preallocated arrays, split into views
+        input_shape, target_shape, n_timesteps, transient_bytes = _sample_shapes(fct, p)
+        counts = {'train': p['n_train'], 'valid': p['n_valid'], 'test': p['n_test']}
+        arrays = {}
+        for split, n in counts.items():
+            arrays[f'X_{split}'] = ((n,) + input_shape, f8)
+            arrays[f'Y_{split}'] = ((n, n_timesteps, target_shape[-1]) if sparse_targets else (n,) + target_shape, f8)
+            arrays[f'T_{split}'] = ((n, n_timesteps), i8)
+        output_bytes = sum(nbytes(*array) for array in arrays.values())
+        sample_bytes = nbytes(input_shape, f8) + nbytes(target_shape, f8) + nbytes((n_timesteps,), i8)
+        peak_bytes = output_bytes + 3 * sample_bytes + transient_bytes
+
+    # Margin for the small temporaries (indices, one-hot lookups...) not counted above
+    peak_bytes += _PEAK_MARGIN_BYTES
+
+    arrays = {name: {'shape': shape, 'dtype': str(dtype), 'bytes': nbytes(shape, dtype)} for name, (shape, dtype) in arrays.items()}
+    return arrays, output_bytes, peak_bytes
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+import stream_benchmark as sb
+
+
+def make_task(rng, n_samples, n_predictions, error_rate, correlated, n_classes=3):
+    """
+    Random one-hot targets and predictions with a given error rate.
+    The errors hit whole samples if correlated, single predictions otherwise.
+    """
+    labels = rng.integers(0, n_classes, size=(n_samples, n_predictions))
+    if correlated:
+        wrong = np.repeat(rng.random((n_samples, 1)) < error_rate, n_predictions, axis=1)
+    else:
+        wrong = rng.random((n_samples, n_predictions)) < error_rate
+    predicted = np.where(wrong, (labels + 1) % n_classes, labels)
+    Y = np.eye(n_classes)[labels]
+    Y_hat = np.eye(n_classes)[predicted]
+    X = np.arange(n_samples).reshape(-1, 1, 1) # sample index, used by the predictor
+    T = np.tile(np.arange(n_predictions), (n_samples, 1))
+    return X, Y, Y_hat, T
+
+@pytest.mark.parametrize("n_predictions, correlated", [(50, True), (50, False), (1, False)])
+def test_classification_interval_coverage(n_predictions, correlated):
+    rng = np.random.default_rng(0)
+    error_rate, n_trials = 0.3, 200
+    covered = 0
+    for _ in range(n_trials):
+        X, Y, Y_hat, T = make_task(rng, 3000, n_predictions, error_rate, correlated)
+        result = sb.compute_score_early_stopping(lambda x: Y_hat[x[:, 0, 0]], X, Y, T, classification=True, tolerance=0.03)
+        assert result['converged']
+        covered += result['lower'] <= error_rate <= result['upper']
+    assert covered / n_trials >= 0.9
+
+def test_regression_interval_coverage():
+    rng = np.random.default_rng(0)
+    n_trials, covered = 200, 0
+    for _ in range(n_trials):
+        # Per-sample offsets make the errors correlated within a sample, true MSE = 0.25 + 0.01
+        Y = rng.normal(size=(3000, 20, 1))
+        Y_hat = Y + rng.normal(0, 0.5, size=(3000, 1, 1)) + rng.normal(0, 0.1, size=Y.shape)
+        X = np.arange(3000).reshape(-1, 1, 1)
+        T = np.tile(np.arange(20), (3000, 1))
+        result = sb.compute_score_early_stopping(lambda x: Y_hat[x[:, 0, 0]], X, Y, T, classification=False, tolerance=0.02)
+        covered += result['lower'] <= 0.26 <= result['upper']
+    assert covered / n_trials >= 0.9
+
+def test_stops_early_and_matches_compute_score():
+    rng = np.random.default_rng(1)
+    X, Y, Y_hat, T = make_task(rng, 5000, 10, 0.2, correlated=False)
+    result = sb.compute_score_early_stopping(lambda x: Y_hat[x[:, 0, 0]], X, Y, T, classification=True, tolerance=0.02)
+    assert result['converged'] and result['n_samples'] < 5000
+    n = result['n_samples']
+    assert np.isclose(result['score'], sb.compute_score(Y[:n], Y_hat[:n], T[:n], classification=True))
+
+def test_single_sequence_tasks_are_rejected():
+    data = sb.build_task('sinus_forecasting', 'small')
+    with pytest.raises(ValueError, match="compute_score"):
+        sb.compute_score_early_stopping(lambda x: x, data['X_test'], data['Y_test'], data['T_test'], data['classification'])
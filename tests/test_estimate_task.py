@@ -0,0 +1,66 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import stream_benchmark as sb
+from stream_benchmark import evals
+
+
+TASK_NAMES = [name for name in evals.stream_small if name != 'sequential_mnist']
+
+
+def test_estimate_large_onehot_sorting_allocates_nothing():
+    tracemalloc.start()
+    estimate = sb.estimate_task('sorting_problem', 'medium', sequence_length=50000)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert estimate['arrays']['X_train']['shape'] == (10000, 100001, 3 + 50001)
+    assert peak < 2**20
+
+@pytest.mark.parametrize("task_name", TASK_NAMES)
+@pytest.mark.parametrize("sparse_targets", [False, True])
+def test_estimate_matches_build_task(task_name, sparse_targets):
+    estimate = sb.estimate_task(task_name, 'small', sparse_targets=sparse_targets)
+    data = sb.build_task(task_name, 'small', sparse_targets=sparse_targets)
+    for name, array in estimate['arrays'].items():
+        assert data[name].shape == array['shape']
+        assert str(data[name].dtype) == array['dtype']
+        assert data[name].nbytes == array['bytes']
+
+@pytest.mark.parametrize("task_name", TASK_NAMES)
+@pytest.mark.parametrize("sparse_targets", [False, True])
+def test_estimate_peak_is_not_undercounted(task_name, sparse_targets):
+    estimate = sb.estimate_task(task_name, 'medium', sparse_targets=sparse_targets)
+    # Warm up, the first call allocates caches of numpy that are not part of the task
+    sb.build_task(task_name, 'small', sparse_targets=sparse_targets)
+    tracemalloc.start()
+    sb.build_task(task_name, 'medium', sparse_targets=sparse_targets)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert estimate['peak_bytes'] >= peak
+
+def test_estimate_overrides_match_build_task():
+    estimate = sb.estimate_task('sorting_problem', 'small', sequence_length=200, position_encoding='binary')
+    data = sb.build_task('sorting_problem', 'small', sequence_length=200, position_encoding='binary')
+    assert data['X_train'].shape == estimate['arrays']['X_train']['shape']
+
+@pytest.mark.parametrize("task_name", ['simple_copy', 'sinus_forecasting', 'chaotic_forecasting'])
+def test_max_bytes_writes_memmaps(task_name, tmp_path):
+    np.random.seed(0)
+    data = sb.build_task(task_name, 'small', max_bytes=1, memmap_dir=str(tmp_path))
+    np.random.seed(0)
+    reference = sb.build_task(task_name, 'small')
+    for name in ['X_train', 'Y_train', 'X_test', 'Y_test']:
+        assert isinstance(data[name], np.memmap)
+        assert np.array_equal(data[name], reference[name])
+    assert any(tmp_path.iterdir())
+
+def test_max_bytes_within_budget_stays_in_memory(tmp_path):
+    data = sb.build_task('simple_copy', 'small', max_bytes=2**40, memmap_dir=str(tmp_path))
+    assert not isinstance(data['X_train'], np.memmap)
+    assert not any(tmp_path.iterdir())
+
+def test_max_bytes_requires_memmap_dir():
+    with pytest.raises(ValueError):
+        sb.build_task('simple_copy', 'small', max_bytes=1)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import stream_benchmark as sb
+
+
+TASK_NAMES = ['sinus_forecasting', 'chaotic_forecasting', 'discrete_postcasting', 'continuous_postcasting',
+              'discrete_pattern_completion', 'continuous_pattern_completion', 'bracket_matching', 'simple_copy',
+              'selective_copy', 'adding_problem', 'sorting_problem']
+# Tasks whose dense targets are zeros outside of the prediction timesteps
+ZERO_PADDED_TASK_NAMES = ['discrete_postcasting', 'continuous_postcasting', 'bracket_matching', 'simple_copy',
+                          'selective_copy', 'adding_problem', 'sorting_problem']
+
+
+def build_dense_and_sparse(task_name):
+    """
+    Build the same task with dense and sparse targets.
+    """
+    np.random.seed(0)
+    dense = sb.build_task(task_name, 'small')
+    np.random.seed(0)
+    sparse = sb.build_task(task_name, 'small', sparse_targets=True)
+    return dense, sparse
+
+@pytest.mark.parametrize("task_name", TASK_NAMES)
+def test_sparse_score_matches_dense_score(task_name):
+    dense, sparse = build_dense_and_sparse(task_name)
+    Y_hat = dense['Y_test'] + np.random.default_rng(0).normal(0, 0.5, size=dense['Y_test'].shape)
+    score = sb.compute_score(dense['Y_test'], Y_hat, dense['T_test'], dense['classification'])
+    assert sb.compute_score(sparse['Y_test'], Y_hat, sparse['T_test'], sparse['classification'], sparse_targets=True) == pytest.approx(score)
+
+    scores = sb.compute_scores(sparse['Y_test'], np.stack([Y_hat, Y_hat]), sparse['T_test'], sparse['classification'], sparse_targets=True)
+    assert np.allclose(scores, score)
+
+@pytest.mark.parametrize("task_name", ['simple_copy', 'adding_problem'])
+def test_sparse_early_stopping_matches_dense(task_name):
+    dense, sparse = build_dense_and_sparse(task_name)
+    X = np.arange(dense['X_test'].shape[0]).reshape(-1, 1, 1) # sample index, used by the predictor
+    Y_hat = dense['Y_test'] + np.random.default_rng(0).normal(0, 0.5, size=dense['Y_test'].shape)
+    predict = lambda x: Y_hat[x[:, 0, 0]]
+    result = sb.compute_score_early_stopping(predict, X, dense['Y_test'], dense['T_test'], dense['classification'])
+    sparse_result = sb.compute_score_early_stopping(predict, X, sparse['Y_test'], sparse['T_test'], sparse['classification'], sparse_targets=True)
+    assert sparse_result['score'] == pytest.approx(result['score'])
+    assert sparse_result['n_samples'] == result['n_samples']
+
+@pytest.mark.parametrize("task_name", ZERO_PADDED_TASK_NAMES)
+def test_densify_targets_round_trip(task_name):
+    dense, sparse = build_dense_and_sparse(task_name)
+    for split in ['train', 'valid', 'test']:
+        Y_dense = sb.densify_targets(sparse[f'Y_{split}'], sparse[f'T_{split}'], sparse[f'X_{split}'].shape[1])
+        assert np.array_equal(Y_dense, dense[f'Y_{split}'])
+
+def test_baseline_with_sparse_targets():
+    dense, sparse = build_dense_and_sparse('simple_copy')
+    assert sb.evaluate_baseline(sparse, units=50, seed=0) == pytest.approx(sb.evaluate_baseline(dense, units=50, seed=0))
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from stream_benchmark import _to_numpy
+
+
+class DeviceArray:
+    """
+    Array exposing __dlpack__ but refusing to export itself, like a GPU tensor or a tensor requiring grad.
+    """
+    def __dlpack__(self, **kwargs):
+        raise BufferError("array is on a device")
+
+    def __dlpack_device__(self):
+        return (2, 0)
+
+def test_to_numpy_converts_without_copy_when_possible():
+    array = np.arange(6.0).reshape(2, 3)
+    assert _to_numpy(array) is array
+    assert np.array_equal(_to_numpy(array.tolist()), array)
+
+def test_to_numpy_rejects_arrays_not_exportable_through_dlpack():
+    with pytest.raises(TypeError, match=r"\.detach\(\)\.cpu\(\)"):
+        _to_numpy(DeviceArray())